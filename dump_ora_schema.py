@@ -10,6 +10,8 @@ import re
 import datetime
 import getopt
 import sys
+import zlib
+import sqlite3
 import cx_Oracle
 import contextlib
 
@@ -75,6 +77,46 @@ dump_path_ = None
 log_ = None
 conn_ = None
 use_tablespaces_ = True
+shard_ = None # (index, count) when only a share of the objects is to be dumped, e.g. (0, 4)
+run_id_ = None # identifies the run the shards belong to, the merge step checks that all manifests share it
+index_ = None # sqlite3 connection to the search index, if one has to be built
+index_schema_ = None # schema whose objects are being added to the search index
+
+# parse a shard specification in the form "i/N" with 0 <= i < N
+def parse_shard(spec):
+    idx, cnt = spec.split("/")
+    idx, cnt = int(idx), int(cnt)
+
+    if cnt < 1 or idx < 0 or idx >= cnt:
+        raise ValueError("invalid shard '%s'" % spec)
+
+    return (idx, cnt)
+
+# tells whether an object belongs to the current shard, the partition is based on
+# a stable hash of type and name so that every host computes the same assignment
+def in_shard(obj_type, obj_name):
+    if shard_ is None:
+        return True
+
+    # NOTE: crc32 is signed in Python 2, mask it so that every host computes the same value
+    return (zlib.crc32(("%s/%s" % (obj_type, obj_name)).encode("utf-8")) & 0xffffffff) % shard_[1] == shard_[0]
+
+def shard_manifest_path(dump_path, idx, cnt):
+    return "%s/__shard_%d_of_%d.json" % (dump_path, idx, cnt)
+
+def shard_log_path(dump_path, folder_name, idx, cnt):
+    return "%s/db_%s.shard_%d_of_%d.log" % (dump_path, folder_name, idx, cnt)
+
+# remove the files left in the dump folder by a previous run of the current shard,
+# every (folder, extension) pair maps back to a single object type
+def remove_shard_files(dump_path):
+    for obj_type in obj_type_folder_map:
+        folder = "%s/%s" % (dump_path, obj_type_folder_map[obj_type])
+        suffix = "." + obj_type_fileext_map[obj_type]
+
+        for fname in os.listdir(folder):
+            if fname.endswith(suffix) and in_shard(obj_type, fname[:-len(suffix)]):
+                os.remove("%s/%s" % (folder, fname))
 
 # UNUSED
 # class to create a file for an Oracle object and add code to it in a line-by-line fashion
@@ -122,9 +164,28 @@ class sql_dumper():
         log_.write("creating db object %s of type %s\n" % (obj_name, obj_type))
         self.conn_.execute(self.sql_)
 
+# collects the text written to it, unlike io.StringIO it accepts str in Python 2 as well
+class text_buffer:
+    def __init__(self):
+        self.parts_ = []
+
+    def write(self, txt):
+        self.parts_.append(txt)
+
+    def getvalue(self):
+        return "".join(self.parts_)
+
+    def close(self):
+        pass
+
 def make_dir_if_none(dirname):
     if not os.path.exists(dirname):
-        os.mkdir(dirname)
+        # another shard may create it in the meantime
+        try:
+            os.mkdir(dirname)
+        except OSError:
+            if not os.path.isdir(dirname):
+                raise
         
 def main(dump_root, schema_details):
     global dump_path_
@@ -133,7 +194,22 @@ def main(dump_root, schema_details):
     print("Dumping schema '" + schema_details["schema"] + "' - " + schema_details["comment"])
 
     dump_path_ = dump_root + "/" + schema_details["folder_name"]
-    os.mkdir(dump_path_)
+
+    if shard_ is None:
+        os.mkdir(dump_path_)
+    else:
+        # all the shards write into the same folder, whoever comes first creates it
+        try:
+            os.mkdir(dump_path_)
+        except OSError:
+            if not os.path.isdir(dump_path_):
+                raise
+
+        # the manifest of a previous run must not be taken for the result of this one
+        manifest_path = shard_manifest_path(dump_path_, shard_[0], shard_[1])
+
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
 
     # create a folder for each type of Oracle object
     make_dir_if_none(dump_path_ + "/" + obj_type_folder_map["TYPE"])
@@ -151,17 +227,29 @@ def main(dump_root, schema_details):
     make_dir_if_none(dump_path_ + "/" + obj_type_folder_map["VIEW"])
     make_dir_if_none(dump_path_ + "/" + obj_type_folder_map["TABLE"])
 
-    log_ = open("%s/db_%s.log" % (dump_path_, schema_details["folder_name"]), "w")
+    if shard_ is not None:
+        remove_shard_files(dump_path_)
+
+    if shard_ is None:
+        log_ = open("%s/db_%s.log" % (dump_path_, schema_details["folder_name"]), "w")
+    else:
+        log_ = open(shard_log_path(dump_path_, schema_details["folder_name"], shard_[0], shard_[1]), "w")
 
     log_.write("dump_ora_schema.py\n")
     log_.write("------------- Starting ------------- %s\n\n" % str(datetime.datetime.now())) # datetime.date.today()
     log_.write("Dumping schema '%s' - %s\n" % (schema_details["schema"], schema_details["comment"]))
 
+    if shard_ is not None:
+        log_.write("Shard %d/%d - run %s\n" % (shard_[0], shard_[1], run_id_))
+
     # create the connection
     global conn_
     conn_ = cx_Oracle.connect("%s/%s@%s" % (schema_details["schema"], schema_details["pwd"], schema_details["tns"]))
 
-    write_stats()
+    stats = query_stats()
+
+    if shard_ is None:
+        write_stats(log_, stats)
 
     with contextlib.closing(conn_.cursor()) as cursor:
         cursor.execute("select sys_context('USERENV', 'CURRENT_SCHEMA') from dual")
@@ -169,82 +257,220 @@ def main(dump_root, schema_details):
         log_.write("\n")
         log_.write("--------------------------------------------------------------------------------\n")
 
+        schema = cursor.fetchone()[0]
+
+        if index_ is not None:
+            global index_schema_
+            index_schema_ = schema
+
+            # the dump replaces whatever was indexed before for the schema
+            index_clear_schema(schema)
+
         # start the actual work
-        file_dump(cursor.fetchone()[0])
+        file_dump(schema)
 
-    write_master_sql()
+    if index_ is not None:
+        index_.commit()
+
+    master_entries = query_master_entries()
+
+    if shard_ is None:
+        write_master_sql(dump_path_, master_entries)
 
     conn_.close()
 
     log_.write("------------- Finished ------------- %s\n" % str(datetime.datetime.now())) # datetime.date.today()
 
-# log some statistics with the count of objects for each type and the count of tables and indexes for each tablespace 
-def write_stats():
-    # log the number of objects for each type
+    if shard_ is not None:
+        log_.close()
+
+        # the manifest is written last, its presence tells the merge step that the shard is complete;
+        # it is renamed into place so that a partially written file is never found
+        manifest_path = shard_manifest_path(dump_path_, shard_[0], shard_[1])
+
+        with open(manifest_path + ".tmp", "w") as manifest:
+            json.dump({
+                "schema": schema_details["schema"],
+                "run_id": run_id_,
+                "shard": list(shard_),
+                "log": os.path.basename(shard_log_path(dump_path_, schema_details["folder_name"], shard_[0], shard_[1])),
+                "stats": stats,
+                "master_entries": master_entries
+            }, manifest, indent=2)
+
+        os.rename(manifest_path + ".tmp", manifest_path)
+
+# combine the manifests of all the shards of a schema: write __master.sql, the stats and a combined log
+def merge_shards(dump_root, schema_details, shard_count):
+    print("Merging %d shards of schema '%s' - %s" % (shard_count, schema_details["schema"], schema_details["comment"]))
+
+    dump_path = dump_root + "/" + schema_details["folder_name"]
+
+    manifests = []
+
+    for idx in range(shard_count):
+        manifest_path = shard_manifest_path(dump_path, idx, shard_count)
+
+        if not os.path.exists(manifest_path):
+            raise RuntimeError("missing manifest for shard %d/%d: %s" % (idx, shard_count, manifest_path))
+
+        with open(manifest_path, "r") as manifest:
+            manifests.append(json.load(manifest))
+
+    # all the manifests must come from the same run of the same schema
+    run_id = run_id_ if run_id_ is not None else manifests[0]["run_id"]
+
+    for idx, manifest in enumerate(manifests):
+        if manifest["schema"] != schema_details["schema"]:
+            raise RuntimeError("manifest for shard %d/%d belongs to schema '%s'" % (idx, shard_count, manifest["schema"]))
+
+        if manifest["shard"] != [idx, shard_count]:
+            raise RuntimeError("manifest for shard %d/%d is for shard %d/%d" % (idx, shard_count, manifest["shard"][0], manifest["shard"][1]))
+
+        if manifest["run_id"] != run_id:
+            raise RuntimeError("manifest for shard %d/%d belongs to run '%s', not '%s'" % (idx, shard_count, manifest["run_id"], run_id))
+
+    stats = {"objects": [], "tables": [], "indexes": []}
+    master_entries = []
+
+    for manifest in manifests:
+        for key in stats:
+            stats[key] += manifest["stats"][key]
+        master_entries += manifest["master_entries"]
+
+    master_entries.sort(key=lambda entry: (entry[0], entry[1]))
+
+    write_master_sql(dump_path, master_entries)
+
+    with open("%s/db_%s.log" % (dump_path, schema_details["folder_name"]), "w") as log:
+        log.write("dump_ora_schema.py\n")
+        log.write("------------- Merging ------------- %s\n\n" % str(datetime.datetime.now()))
+        log.write("Dumping schema '%s' - %s\n" % (schema_details["schema"], schema_details["comment"]))
+        log.write("Merged from %d shards - run %s\n" % (shard_count, run_id))
+
+        write_stats(log, stats)
+
+        for manifest in manifests:
+            log.write("\n")
+            log.write("================================================================================\n")
+            log.write("Shard %d/%d\n" % tuple(manifest["shard"]))
+
+            with open("%s/%s" % (dump_path, manifest["log"]), "r") as shard_log:
+                log.write(shard_log.read())
+
+# sum the counts of a list of [name, count] pairs, keeping the names sorted
+def sum_counts(pairs):
+    totals = {}
+
+    for name, cnt in pairs:
+        totals[name] = totals.get(name, 0) + cnt
+
+    return [[name, totals[name]] for name in sorted(totals, key=lambda name: (name is None, name or ""))]
+
+# count the objects for each type and the tables and indexes for each tablespace,
+# a shard has to fetch the names to count only the objects belonging to it
+def query_stats():
+    stats = {}
+
     # NOTE: ignore Oracle recycle bin
+    with contextlib.closing(conn_.cursor()) as crsr:
+        if shard_ is None:
+            crsr.execute("select object_type, count(*)" \
+                         " from user_objects" \
+                         " where object_name not like 'BIN$%'" \
+                         " group by object_type")
+
+            stats["objects"] = sum_counts(crsr.fetchall())
+        else:
+            crsr.execute("select object_type, object_name" \
+                         " from user_objects" \
+                         " where object_name not like 'BIN$%'")
+
+            stats["objects"] = sum_counts([[obj_type, 1] for obj_type, obj_name in crsr.fetchall() if in_shard(obj_type, obj_name)])
 
     with contextlib.closing(conn_.cursor()) as crsr:
-        crsr.execute("select object_type, count(*)" \
-                     " from user_objects" \
-                     " where object_name not like 'BIN$%'" \
-                     " group by object_type" \
-                     " order by object_type")
+        if shard_ is None:
+            crsr.execute("select tablespace_name, count(1)" \
+                         " from user_tables" \
+                         " where table_name not like 'BIN$%'" \
+                         " and temporary = 'N'" \
+                         " group by tablespace_name")
+
+            stats["tables"] = sum_counts(crsr.fetchall())
+        else:
+            crsr.execute("select tablespace_name, table_name" \
+                         " from user_tables" \
+                         " where table_name not like 'BIN$%'" \
+                         " and temporary = 'N'")
+
+            stats["tables"] = sum_counts([[tblspace_name, 1] for tblspace_name, tbl_name in crsr.fetchall() if in_shard("TABLE", tbl_name)])
+
+    with contextlib.closing(conn_.cursor()) as crsr:
+        if shard_ is None:
+            crsr.execute("select tablespace_name, count(1)" \
+                         " from user_indexes" \
+                         " where index_name not like 'BIN$%'" \
+                         " group by tablespace_name")
 
-        count = 0
+            stats["indexes"] = sum_counts(crsr.fetchall())
+        else:
+            crsr.execute("select tablespace_name, index_name" \
+                         " from user_indexes" \
+                         " where index_name not like 'BIN$%'")
 
-        for column_1, column_2 in crsr.fetchall():
-            log_.write("%s\t%d\n" % (column_1, column_2))
-            count = count + column_2
+            stats["indexes"] = sum_counts([[tblspace_name, 1] for tblspace_name, idx_name in crsr.fetchall() if in_shard("INDEX", idx_name)])
 
-    log_.write("Total number of objects\t%d\n\n" % count)
+    return stats
+
+# log some statistics with the count of objects for each type and the count of tables and indexes for each tablespace 
+def write_stats(log, stats):
+    # log the number of objects for each type
+    count = 0
 
-    log_.write("--------------------------------------------------------------------------------\n")
-    log_.write("Table distribution across tablespaces:\n\n")
+    for obj_type, cnt in sum_counts(stats["objects"]):
+        log.write("%s\t%d\n" % (obj_type, cnt))
+        count = count + cnt
+
+    log.write("Total number of objects\t%d\n\n" % count)
+
+    log.write("--------------------------------------------------------------------------------\n")
+    log.write("Table distribution across tablespaces:\n\n")
 
     # alter table <table-name> move tablespace <new-tablespace>;
     # alter index <index-name> rebuild tablespace <new-tablespace>;
 
-    with contextlib.closing(conn_.cursor()) as crsr:
-        crsr.execute("select tablespace_name, count(1)" \
-                     " from user_tables" \
-                     " where table_name not like 'BIN$%'" \
-                     " and temporary = 'N'" \
-                     " group by tablespace_name")
+    for tblspace_name, cnt in sum_counts(stats["tables"]):
+        log.write("%s\t%d\n" % (tblspace_name, cnt))
 
-        for tblspace_name, cnt in crsr.fetchall():
-            log_.write("%s\t%d\n" % (tblspace_name, cnt))
+    log.write("--------------------------------------------------------------------------------\n")
+    log.write("Index distribution across tablespaces:\n\n")
 
-    log_.write("--------------------------------------------------------------------------------\n")
-    log_.write("Index distribution across tablespaces:\n\n")
+    for tblspace_name, cnt in sum_counts(stats["indexes"]):
+        log.write("%s\t%d\n" % (tblspace_name, cnt))
 
+# list the [type, name] of the objects of the current shard that go into __master.sql
+def query_master_entries():
     with contextlib.closing(conn_.cursor()) as crsr:
-        crsr.execute("select tablespace_name, count(1)" \
-                     " from user_indexes" \
-                     " where index_name not like 'BIN$%'" \
-                     " group by tablespace_name")
+        crsr.execute("select object_type, object_name" \
+                     " from user_objects" \
+                     " where object_name not like 'BIN$%'" \
+                     " and object_type in (" \
+                     "'TYPE', 'TYPE BODY', 'FUNCTION', 'PROCEDURE'," \
+                     "'PACKAGE', 'PACKAGE BODY', 'TRIGGER', 'SEQUENCE'," \
+                     "'INDEX', 'SYNONYM', 'LOB', 'JAVA CLASS'," \
+                     "'VIEW', 'TABLE'" \
+                     ")" \
+                     " order by object_type, object_name")
 
-        for tblspace_name, cnt in crsr.fetchall():
-            log_.write("%s\t%d\n" % (tblspace_name, cnt))
+        return [[obj_type, obj_name] for obj_type, obj_name in crsr.fetchall() if in_shard(obj_type, obj_name)]
 
 # write the script that collects all other files to apply the dumped structure to a new schema
-def write_master_sql():
-    with open("%s/__master.sql" % dump_path_, "w") as master_sql:
+def write_master_sql(dump_path, master_entries):
+    with open("%s/__master.sql" % dump_path, "w") as master_sql:
         master_sql.write("--\n")
-        
-        with contextlib.closing(conn_.cursor()) as crsr:
-            crsr.execute("select object_type, object_name" \
-                         " from user_objects" \
-                         " where object_name not like 'BIN$%'" \
-                         " and object_type in (" \
-                         "'TYPE', 'TYPE BODY', 'FUNCTION', 'PROCEDURE'," \
-                         "'PACKAGE', 'PACKAGE BODY', 'TRIGGER', 'SEQUENCE'," \
-                         "'INDEX', 'SYNONYM', 'LOB', 'JAVA CLASS'," \
-                         "'VIEW', 'TABLE'" \
-                         ")" \
-                         " order by object_type, object_name")
 
-            for obj_type, obj_name in crsr.fetchall():
-                master_sql.write("@%s/%s.%s\n" % (obj_type_folder_map[obj_type], obj_name, obj_type_fileext_map[obj_type]))
+        for obj_type, obj_name in master_entries:
+            master_sql.write("@%s/%s.%s\n" % (obj_type_folder_map[obj_type], obj_name, obj_type_fileext_map[obj_type]))
 
 #------------------------------------------------------------------------------
 
@@ -261,6 +487,9 @@ def file_dump(schema):
                     " order by table_name")
 
         for col1, col2, col3, col4, col5 in rst.fetchall():
+            if not in_shard("TABLE", col1):
+                continue
+
             dump_table(col1, col2, col3, col4, col5)
 
     # -------------- dump all other objects
@@ -273,6 +502,9 @@ def file_dump(schema):
                      " order by object_type, object_name")
 
         for col1, col2 in rst.fetchall():
+            if not in_shard(col1, col2):
+                continue
+
             if col1 in ("TYPE", "TYPE BODY", "FUNCTION", "PROCEDURE", "PACKAGE", "PACKAGE BODY", "TRIGGER"):
                 dump_source(schema, col1, col2)
             elif col1 in ("SEQUENCE", "INDEX", "SYNONYM"):
@@ -328,8 +560,8 @@ def dump_source(obj_owner, obj_type, obj_name):
                 else:
                     curr_text += re_trailingblanks.sub("", fld1) + "\n" # remove trailing blanks
 
-            fstream.write("create or replace ")
-            fstream.write(re_trailingblanks.sub("", curr_text)) # remove trailing blank lines
+            curr_text = "create or replace " + re_trailingblanks.sub("", curr_text) # remove trailing blank lines
+            fstream.write(curr_text)
             #dumper.add_line("create or replace ")
             #dumper.add_line(curr_text)
 
@@ -339,6 +571,8 @@ def dump_source(obj_owner, obj_type, obj_name):
 
             #dumper.close()
 
+        index_object(obj_type, obj_name, curr_text)
+
 # used for SEQUENCE, INDEX, SYNONYM
 def dump_source2(obj_owner, obj_type, obj_name):
     with contextlib.closing(conn_.cursor()) as rst2:
@@ -527,7 +761,8 @@ def dump_table(tbl_name, tblspc_name, temp, duration, iot_type):
 
             log_.write("creating file %s.%s\n" % (tbl_name, obj_type_fileext_map["TABLE"]))
 
-            with open("%s/%s/%s.%s" % (dump_path_, obj_type_folder_map["TABLE"], tbl_name, obj_type_fileext_map["TABLE"]), "w") as fstream:
+            # the script is built in memory, then written out and handed to the search index in one go
+            with contextlib.closing(text_buffer()) as fstream:
                 #dumper.init(tbl_name, "TABLE")
 
                 if temp == "Y":
@@ -608,6 +843,11 @@ def dump_table(tbl_name, tblspc_name, temp, duration, iot_type):
                 dump_table_comments(fstream, tbl_name)
                 dump_table_constraints(fstream, tbl_name)
                 dump_table_grants(fstream, tbl_name)
+
+                with open("%s/%s/%s.%s" % (dump_path_, obj_type_folder_map["TABLE"], tbl_name, obj_type_fileext_map["TABLE"]), "w") as fout:
+                    fout.write(fstream.getvalue())
+
+                index_object("TABLE", tbl_name, fstream.getvalue())
     #except Exception as inst:
     #    print >> log_, type(inst)     # the exception instance
     #    print >> log_, inst.args      # arguments stored in .args
@@ -629,33 +869,188 @@ def dump_view(vw_name):
 
                 p = re.compile(r"\s+$") # trailing blanks
 
+                all_text = "create or replace view %s as\n" % vw_name
+
                 for fld1 in rst2.fetchall():
                     # right trim the source code and add a semicolon
                     text = p.sub("", str(fld1[0])) + ";" # FED why do we need [0] ???
                     fstream.write(text + "\n")
                     #dumper.add_line(text)
+                    all_text += text + "\n"
 
                 #dumper.close()
+
+            index_object("VIEW", vw_name, all_text)
     #except Exception as inst:
     #    print >> log_, type(inst)     # the exception instance
     #    print >> log_, inst.args      # arguments stored in .args
     #    print >> log_, inst           # __str__ allows args to printed directly
     #    log_.write("error\n")
 #------------------------------------------------------------------------------
+# search index: the source of every dumped object, line by line in an SQLite FTS5 table,
+# and the identifiers referenced by each object and line
+
+# reserved words of Oracle SQL and PL/SQL, they can never be the name of an object or a field
+sql_keywords = frozenset("""
+    ACCESS ADD ALL ALTER AND ANY AS ASC AT AUDIT BEGIN BETWEEN BY CASE CHAR CHECK CLUSTER CLUSTERS
+    COLAUTH COLUMN COLUMNS COMMENT COMPRESS CONNECT CRASH CREATE CURRENT CURSOR DATE DECIMAL DECLARE
+    DEFAULT DELETE DESC DISTINCT DROP ELSE END EXCEPTION EXCLUSIVE EXISTS FETCH FILE FLOAT FOR FROM
+    FUNCTION GOTO GRANT GROUP HAVING IDENTIFIED IF IMMEDIATE IN INCREMENT INDEX INDEXES INITIAL
+    INSERT INTEGER INTERSECT INTO IS LEVEL LIKE LOCK LONG MAXEXTENTS MINUS MLSLABEL MODE MODIFY
+    NOAUDIT NOCOMPRESS NOT NOWAIT NULL NUMBER OF OFFLINE ON ONLINE OPTION OR ORDER OVERLAPS PCTFREE
+    PRIOR PRIVILEGES PROCEDURE PUBLIC RAW RENAME RESOURCE REVOKE ROW ROWID ROWNUM ROWS SELECT SESSION
+    SET SHARE SIZE SMALLINT SQL START SUCCESSFUL SYNONYM SYSDATE TABAUTH TABLE THEN TO TRIGGER UID
+    UNION UNIQUE UPDATE USER VALIDATE VALUES VARCHAR VARCHAR2 VIEW VIEWS WHEN WHENEVER WHERE WITH
+""".split())
+
+# comments, string literals, numbers, ".." and any other punctuation are single tokens,
+# names are either double-quoted or plain
+re_index_token = re.compile(r"""--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|"([^"\n]+)"|([A-Za-z][A-Za-z0-9_$#]*)|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|\.\.|(\.)|\n|[^\s]""", re.DOTALL)
+
+# the rowid of a line in source_lines is (object id << index_line_bits) + line number,
+# so the lines of an object can be deleted by rowid range
+index_line_bits = 24
+
+def open_index(path):
+    conn = sqlite3.connect(path)
+
+    conn.execute("create table if not exists objects (" \
+                 " id integer primary key," \
+                 " schema text not null," \
+                 " obj_type text not null," \
+                 " obj_name text not null," \
+                 " path text not null," \
+                 " unique (schema, obj_type, obj_name))")
+    conn.execute("create virtual table if not exists source_lines using fts5(text)")
+    conn.execute("create table if not exists refs (" \
+                 " identifier text not null," \
+                 " object_id integer not null," \
+                 " line integer not null)")
+    conn.execute("create index if not exists refs_identifier on refs (identifier)")
+    conn.execute("create index if not exists refs_object_id on refs (object_id)")
+
+    return conn
+
+def index_clear_schema(schema):
+    ids = [row[0] for row in index_.execute("select id from objects where schema = ?", (schema,))]
+
+    for obj_id in ids:
+        index_.execute("delete from source_lines where rowid between ? and ?",
+                       (obj_id << index_line_bits, ((obj_id + 1) << index_line_bits) - 1))
+        index_.execute("delete from refs where object_id = ?", (obj_id,))
+        index_.execute("delete from objects where id = ?", (obj_id,))
+
+# list the (identifier, line) pairs referenced in the source code of an object,
+# dotted names such as SCH.PKG.PROC are recorded as a whole and by every run of consecutive parts
+# (SCH, PKG, PROC, SCH.PKG, PKG.PROC)
+def extract_references(text):
+    refs = set()
+    line = 1
+    name = []        # parts of the dotted name being scanned
+    name_line = 1
+    name_end = -1    # position right after the last part of the name
+    dot_end = -1     # position right after a dot directly following the name
+
+    def flush():
+        for i in range(len(name)):
+            for j in range(i + 1, len(name) + 1):
+                refs.add((".".join(name[i:j]), name_line))
+
+    for m in re_index_token.finditer(text):
+        quoted, plain, dot = m.group(1), m.group(2), m.group(3)
+
+        if quoted is not None or plain is not None:
+            ident = quoted if quoted is not None else plain.upper()
+
+            # a name is continued only by a part directly following its dot,
+            # such a part is never a keyword (e.g. l_rec.type)
+            if name and m.start() == dot_end:
+                name.append(ident)
+                name_end = m.end()
+            elif quoted is None and ident in sql_keywords:
+                flush()
+                name = []
+            else:
+                flush()
+                name = [ident]
+                name_line = line
+                name_end = m.end()
+        elif dot is not None and name and m.start() == name_end:
+            dot_end = m.end()
+        else:
+            flush()
+            name = []
+
+        line += m.group(0).count("\n")
+
+    flush()
+
+    return refs
+
+def index_object(obj_type, obj_name, text):
+    if index_ is None:
+        return
+
+    crsr = index_.execute("insert into objects (schema, obj_type, obj_name, path) values (?, ?, ?, ?)",
+                          (index_schema_, obj_type, obj_name,
+                           "%s/%s/%s.%s" % (dump_path_, obj_type_folder_map[obj_type], obj_name, obj_type_fileext_map[obj_type])))
+    obj_id = crsr.lastrowid
+
+    # NOTE: an object never comes near the 2^24 lines allowed by index_line_bits
+    index_.executemany("insert into source_lines (rowid, text) values (?, ?)",
+                       [((obj_id << index_line_bits) + i + 1, txt) for i, txt in enumerate(text.split("\n"))])
+
+    # an object does not reference itself
+    index_.executemany("insert into refs (identifier, object_id, line) values (?, ?, ?)",
+                       [(ident, obj_id, line) for ident, line in extract_references(text) if ident != obj_name])
+
+# print the objects and lines that reference an identifier, e.g. MY_TABLE or MY_PACKAGE.MY_PROC
+def query_references(conn, identifier):
+    # quoted parts keep their case, plain parts are uppercased as Oracle does
+    identifier = ".".join(quoted if quoted else plain.strip().upper()
+                          for quoted, plain in re.findall(r'"([^"]+)"|([^."]+)', identifier))
+
+    for schema, obj_type, obj_name, path, line in conn.execute("select distinct o.schema, o.obj_type, o.obj_name, o.path, r.line" \
+                                                               " from refs r, objects o" \
+                                                               " where r.object_id = o.id" \
+                                                               " and r.identifier = ?" \
+                                                               " order by o.schema, o.obj_type, o.obj_name, r.line",
+                                                               (identifier,)):
+        print("%s\t%s\t%s\t%s:%d" % (schema, obj_type, obj_name, path, line))
+
+# print the lines containing a text, searched as an FTS5 phrase
+def query_text(conn, text):
+    for schema, obj_type, obj_name, path, line, txt in conn.execute("select o.schema, o.obj_type, o.obj_name, o.path, s.rowid & %d, s.text" \
+                                                                    " from source_lines s, objects o" \
+                                                                    " where s.rowid >> %d = o.id" \
+                                                                    " and source_lines match ?" \
+                                                                    " order by o.schema, o.obj_type, o.obj_name, s.rowid" % ((1 << index_line_bits) - 1, index_line_bits),
+                                                                    ("\"" + text.replace("\"", "\"\"") + "\"",)):
+        print("%s\t%s\t%s\t%s:%d\t%s" % (schema, obj_type, obj_name, path, line, txt.strip()))
+
+#------------------------------------------------------------------------------
 
 def print_usage():
-    print("dump_ora_schema.py --conf <config_file> --output_root_folder <output_root_folder>")
+    print("dump_ora_schema.py --conf <config_file> --output_root_folder <output_root_folder> [--index <index_file>]")
+    print("dump_ora_schema.py --conf <config_file> --output_root_folder <output_root_folder> --shard <i>/<N> --run_id <id>")
+    print("dump_ora_schema.py --conf <config_file> --output_root_folder <output_root_folder> --merge <N> [--run_id <id>]")
+    print("dump_ora_schema.py --index <index_file> --refs <identifier>")
+    print("dump_ora_schema.py --index <index_file> --search <text>")
 
 if __name__ == "__main__":
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "hi:o:", ["help", "conf=", "output_root_folder="])
+        opts, args = getopt.getopt(sys.argv[1:], "hi:o:", ["help", "conf=", "output_root_folder=", "shard=", "run_id=", "merge=", "index=", "refs=", "search="])
     except getopt.GetoptError:
         print_usage()
         sys.exit(2)
 
     inputfile = "schemas.json" # default configuration file name
     dump_root = "."
-    
+    merge_count = None
+    index_file = None
+    refs_identifier = None
+    search_text = None
+
     for opt, arg in opts:
         if opt == "-h" or opt == "--help":
             print_usage()
@@ -664,9 +1059,70 @@ if __name__ == "__main__":
             inputfile = arg
         elif opt == "-o" or opt == "--output_root_folder":
             dump_root = arg
+        elif opt == "--shard":
+            try:
+                shard_ = parse_shard(arg)
+            except ValueError:
+                print_usage()
+                sys.exit(2)
+        elif opt == "--run_id":
+            run_id_ = arg
+        elif opt == "--merge":
+            try:
+                merge_count = int(arg)
+            except ValueError:
+                merge_count = 0
+            if merge_count < 1:
+                print_usage()
+                sys.exit(2)
+        elif opt == "--index":
+            index_file = arg
+        elif opt == "--refs":
+            refs_identifier = arg
+        elif opt == "--search":
+            search_text = arg
+
+    # query an existing search index, nothing is dumped
+    if refs_identifier is not None or search_text is not None:
+        if index_file is None:
+            print_usage()
+            sys.exit(2)
+
+        if not os.path.isfile(index_file):
+            print("Index file not found: %s" % index_file)
+            sys.exit(2)
+
+        with contextlib.closing(sqlite3.connect(index_file)) as conn:
+            if refs_identifier is not None:
+                query_references(conn, refs_identifier)
+            if search_text is not None:
+                query_text(conn, search_text)
+
+        sys.exit()
+
+    if shard_ is not None and merge_count is not None:
+        print_usage()
+        sys.exit(2)
+
+    # the search index is built by a single, unsharded dump
+    if index_file is not None and (shard_ is not None or merge_count is not None):
+        print_usage()
+        sys.exit(2)
+
+    # the run id lets the merge step tell the manifests of this run from stale ones
+    if shard_ is not None and run_id_ is None:
+        print_usage()
+        sys.exit(2)
 
     print("Config file: %s" % inputfile)
     print("Root folder: %s" % dump_root)
+
+    if shard_ is not None:
+        print("Shard: %d/%d - run %s" % (shard_[0], shard_[1], run_id_))
+
+    if index_file is not None:
+        print("Index file: %s" % index_file)
+        index_ = open_index(index_file)
          
     # read the file with the details of each schema to be dumped
     # the file is a JSON array of objects with the following data
@@ -685,4 +1141,10 @@ if __name__ == "__main__":
 
     for it in g_schemas:
         if it["active"]:
-            main(dump_root, it)
+            if merge_count is not None:
+                merge_shards(dump_root, it, merge_count)
+            else:
+                main(dump_root, it)
+
+    if index_ is not None:
+        index_.close()